@@ -1,23 +1,84 @@
-from typing import TypedDict, Literal
+from typing import Annotated, Optional, TypedDict, Literal
 from langgraph.graph import StateGraph, START, END
-from pydantic import BaseModel, Field
-from litellm import completion
+from langgraph.types import Send
+from litellm import acompletion, aembedding
+from openai import AsyncOpenAI, OpenAIError
 from dotenv import load_dotenv
-import json
+import asyncio
+import hashlib
+import logging
+import operator
+import os
+import re
+import weakref
+
+import httpx
+import msgspec
+import orjson
+
+import cache
+import semantic_cache
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Pooled connections belong to the event loop that opened them, so every running loop gets its own client
+_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+
+
+def _get_client() -> AsyncOpenAI:
+    """OpenAI client for the running loop, shared by every LLM call so connections (and TLS sessions) are reused"""
+    loop = asyncio.get_running_loop()
+    client = _CLIENTS.get(loop)
+    if client is None:
+        client = AsyncOpenAI(http_client=httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            timeout=30.0
+        ))
+        _CLIENTS[loop] = client
+    return client
+
+async def aclose() -> None:
+    """Close the running loop's HTTP pool, call it before the loop ends (e.g. at the end of asyncio.run)"""
+    client = _CLIENTS.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+# Caps in-flight LLM calls so large batches stay under the provider rate limit
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+_SEMAPHORES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
 
-# Pydantic models for structured extraction
-class LoanData(BaseModel):
-    borrower_name: str = Field(..., description="Name of the borrower")
-    loan_amount: float = Field(..., description="Loan amount in dollars")
-    interest_rate: float = Field(..., description="Interest rate as percentage")
+def _get_sem() -> asyncio.Semaphore:
+    """Concurrency cap for the running loop, a semaphore is bound to the first loop that waits on it"""
+    loop = asyncio.get_running_loop()
+    sem = _SEMAPHORES.get(loop)
+    if sem is None:
+        sem = _SEMAPHORES[loop] = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return sem
 
 
-class AppraisalData(BaseModel):
-    property_address: str = Field(..., description="Property address")
-    appraised_value: float = Field(..., description="Appraised value in dollars")
+# msgspec structs for structured extraction
+# forbid_unknown_fields emits additionalProperties: false, which OpenAI strict mode requires
+class LoanData(msgspec.Struct, forbid_unknown_fields=True):
+    borrower_name: Annotated[str, msgspec.Meta(description="Name of the borrower")]
+    loan_amount: Annotated[float, msgspec.Meta(description="Loan amount in dollars")]
+    interest_rate: Annotated[float, msgspec.Meta(description="Interest rate as percentage")]
+
+
+class AppraisalData(msgspec.Struct, forbid_unknown_fields=True):
+    property_address: Annotated[str, msgspec.Meta(description="Property address")]
+    appraised_value: Annotated[float, msgspec.Meta(description="Appraised value in dollars")]
+
+
+def _schema(model: type[msgspec.Struct]) -> dict:
+    """Inline JSON schema of a struct (msgspec.json.schema would wrap it in a $ref)"""
+    (_,), components = msgspec.json.schema_components([model])
+    return components[model.__name__]
+
+_LOAN_SCHEMA = _schema(LoanData)
+_APPRAISAL_SCHEMA = _schema(AppraisalData)
 
 
 # Workflow state
@@ -27,93 +88,322 @@ class DocumentState(TypedDict):
     extracted_data: dict
     confidence: float
     error: str
+    content_hash: str
+
+
+# Default values for every field except the document itself
+_EMPTY_STATE = {"classification": "", "extracted_data": {}, "confidence": 0.0, "error": "", "content_hash": ""}
+
 
+# Batch state - many documents in, one result per document out
+class BatchState(TypedDict):
+    documents: list[str]
+    classifications: list[str]
+    content_hashes: list[str]
+    results: Annotated[list[DocumentState], operator.add]
 
-def classify_with_llm(state: DocumentState) -> DocumentState:
-    """Use LLM to classify the document"""
-    prompt = f"""Classify this document into one of these categories:
+
+# Static prompt parts go first and never change between calls, so the provider can reuse the cached prefix
+_LOAN_SCHEMA_JSON = orjson.dumps(_LOAN_SCHEMA, option=orjson.OPT_INDENT_2).decode()
+_APPRAISAL_SCHEMA_JSON = orjson.dumps(_APPRAISAL_SCHEMA, option=orjson.OPT_INDENT_2).decode()
+
+_CLASSIFY_PROMPT_TMPL = """Classify the document below into one of these categories:
 - loan_disclosure
 - appraisal
 - unknown
 
-Document: 
-{state['document']}
-
 Reply with ONLY the category name, nothing else.
-"""
 
-    response = completion(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0
-    )
-
-    classification = response["choices"][0]["message"]["content"].strip().lower()
-    print(f"   [classify_llm] -> {classification}")
+---DOCUMENT---
+{document}"""
 
-    return {"classification": classification}
+_CLASSIFY_BATCH_PROMPT = """Classify each document below into one of these categories:
+- loan_disclosure
+- appraisal
+- unknown
 
-def extract_loan_data(state: DocumentState) -> DocumentState:
-    """Extract loan data from loan disclosure documents"""
-    schema = LoanData.model_json_schema()
+Return a JSON array of category strings, one per document, in order. Return ONLY the JSON array, no code fences.
+"""
 
-    prompt = f"""Extract loan information from this document as JSON.
-    
-Document: 
-{state['document']}
+_LOAN_PROMPT_TMPL = f"""You extract loan JSON matching this schema.
 
 Schema:
-{json.dumps(schema, indent=2)}
+{_LOAN_SCHEMA_JSON}
 
-Return ONLY valid JSON.
-"""
+Rules: return only valid JSON, no code fences.
 
-    response = completion(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0
-    )
+---DOCUMENT---
+{{document}}"""
 
-    json_str = response["choices"][0].message.content
-    json_str = json_str.replace("```json", "").replace("```", "").strip()
+_APPRAISAL_PROMPT_TMPL = f"""You extract appraisal JSON matching this schema.
 
-    data = LoanData.model_validate_json(json_str)
-    print(f"   [extract_loan_data] -> {data.model_dump()}")
+Schema:
+{_APPRAISAL_SCHEMA_JSON}
+
+Rules: return only valid JSON, no code fences.
+
+---DOCUMENT---
+{{document}}"""
+
+# Everything around the document is constant, so each prompt is just prefix + document + suffix
+_CLASSIFY_PREFIX, _CLASSIFY_SUFFIX = _CLASSIFY_PROMPT_TMPL.split("{document}")
+_LOAN_PREFIX, _LOAN_SUFFIX = _LOAN_PROMPT_TMPL.split("{document}")
+_APPRAISAL_PREFIX, _APPRAISAL_SUFFIX = _APPRAISAL_PROMPT_TMPL.split("{document}")
+
+# Keyword -> category votes for the rule-based fast path
+# Generic words like "property" are left out: this path skips the LLM, so it must rarely be wrong
+_KEYWORDS = {
+    "loan": "loan_disclosure",
+    "mortgage": "loan_disclosure",
+    "borrower": "loan_disclosure",
+    "lender": "loan_disclosure",
+    "interest rate": "loan_disclosure",
+    "appraisal": "appraisal",
+    "appraised": "appraisal",
+    "appraiser": "appraisal",
+}
+# Whole words only, "Sloan" or "loaned" must not vote for loan_disclosure
+_KEYWORD_PATTERN = re.compile(r"\b(" + "|".join(map(re.escape, _KEYWORDS)) + r")\b", re.IGNORECASE)
+# The top category needs at least this many votes, and this lead over the runner-up
+_MIN_KEYWORD_SCORE = 2
+_MIN_KEYWORD_MARGIN = 2
+
+_CATEGORIES = ("loan_disclosure", "appraisal", "unknown")
+
+MODEL = "gpt-4o-mini"
+EMBEDDING_MODEL = "text-embedding-3-small"
+# Only the start of a document is embedded, templates differ little beyond it
+_EMBED_CHARS = 2000
+# Extra attempts when the model output fails validation
+MAX_RETRIES = 2
+# From this many documents on, bulk_extract goes through the OpenAI Batch API (half price, delivered within 24h)
+BULK_THRESHOLD = int(os.getenv("BULK_THRESHOLD", "50"))
+_BATCH_POLL_SECONDS = 30
+# Documents per classify_batch call, keeps each prompt well inside the context window
+CLASSIFY_BATCH_SIZE = 25
+
+
+def _response_format(model: type[msgspec.Struct], schema: dict) -> dict:
+    """Structured output spec so the API itself guarantees schema-valid JSON"""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": model.__name__, "schema": schema, "strict": True}
+    }
 
-    return {"extracted_data": data.model_dump(), "confidence": 0.95}
+_LOAN_RESPONSE_FORMAT = _response_format(LoanData, _LOAN_SCHEMA)
+_APPRAISAL_RESPONSE_FORMAT = _response_format(AppraisalData, _APPRAISAL_SCHEMA)
+
+
+async def _llm_completion(messages: list[dict], **kwargs):
+    """Call the LLM, waiting for a concurrency slot first"""
+    async with _get_sem():
+        # num_retries lets litellm back off and retry on RateLimitError
+        return await acompletion(
+            model=MODEL,
+            messages=messages,
+            temperature=0,
+            num_retries=3,
+            client=_get_client(),
+            **kwargs
+        )
+
+async def _embed(docs: list[str]) -> list[list[float]]:
+    """Embed the start of each document with a single call"""
+    async with _get_sem():
+        response = await aembedding(
+            model=EMBEDDING_MODEL,
+            input=[doc[:_EMBED_CHARS] for doc in docs],
+            client=_get_client()
+        )
+    return [item["embedding"] for item in response.data]
+
+async def _embed_or_none(docs: list[str]) -> Optional[list[list[float]]]:
+    """Embed the documents, or None if the call fails (the semantic cache is only a shortcut)"""
+    try:
+        return await _embed(docs)
+    except OpenAIError:
+        logger.warning("Embedding failed, classifying without the semantic cache", exc_info=True)
+        return None
+
+def _content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+# Hashed once at import; being part of every cache key, editing a prompt invalidates its old responses
+_PROMPT_HASHES = {
+    "classify": _content_hash(_CLASSIFY_PREFIX + _CLASSIFY_SUFFIX + _CLASSIFY_BATCH_PROMPT),
+    "extract_loan": _content_hash(_LOAN_PREFIX + _LOAN_SUFFIX),
+    "extract_appraisal": _content_hash(_APPRAISAL_PREFIX + _APPRAISAL_SUFFIX)
+}
+
+def _cache_key(task: str, content_hash: str) -> str:
+    """Content-addressable key for one task (prompt) on one input sent to MODEL"""
+    return _content_hash(f"{MODEL}|{task}|{_PROMPT_HASHES[task]}|{content_hash}")
+
+class ExtractionRefused(Exception):
+    """The model refused to produce the structured output"""
+
+
+async def _extract(prompt: str, key: str, model: type[msgspec.Struct], response_format: dict) -> msgspec.Struct:
+    """Ask the LLM for structured JSON matching the model, retrying with the error as feedback"""
+    json_str = cache.get(key)
+    if json_str is not None:
+        try:
+            return msgspec.json.decode(json_str, type=model)
+        except msgspec.DecodeError:
+            # Stale entry, evict and refetch
+            cache.delete(key)
+
+    messages = [{"role": "user", "content": prompt}]
+    for attempt in range(MAX_RETRIES + 1):
+        response = await _llm_completion(messages, response_format=response_format)
+        message = response["choices"][0]["message"]
+        json_str = message["content"]
+        if json_str is None:
+            # Strict mode answers a refusal with no content at all, retrying the same prompt won't help
+            raise ExtractionRefused(getattr(message, "refusal", None) or "no content returned")
+
+        try:
+            data = msgspec.json.decode(json_str, type=model)
+        except msgspec.DecodeError as e:
+            if attempt == MAX_RETRIES:
+                raise
+            messages = messages + [
+                {"role": "assistant", "content": json_str},
+                {"role": "user", "content": f"Your output had error: {e}. Fix and retry."}
+            ]
+            await asyncio.sleep(1.0 * (attempt + 1))
+            continue
+
+        cache.set(key, json_str)
+        return data
+
+
+def classify_by_keywords(document: str) -> Optional[str]:
+    """Cheap rule-based classification, None when the keywords are not conclusive"""
+    scores = {"loan_disclosure": 0, "appraisal": 0}
+    for match in _KEYWORD_PATTERN.finditer(document):
+        scores[_KEYWORDS[match.group(1).lower()]] += 1
+
+    (top, top_score), (_, runner_up_score) = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    if top_score >= _MIN_KEYWORD_SCORE and top_score - runner_up_score >= _MIN_KEYWORD_MARGIN:
+        return top
+    return None
+
+def hash_doc(state: DocumentState) -> DocumentState:
+    """Hash the document once, every cache lookup downstream reuses it"""
+    if state["content_hash"]:
+        # Already hashed by classify_documents
+        return {}
+    return {"content_hash": _content_hash(state["document"])}
+
+async def _classify_with_llm(document: str) -> str:
+    """Classify one document with the LLM"""
+    prompt = _CLASSIFY_PREFIX + document + _CLASSIFY_SUFFIX
+
+    response = await _llm_completion([{"role": "user", "content": prompt}])
+    return response["choices"][0]["message"]["content"].strip().lower()
+
+async def _classify_ambiguous(documents: list[str], content_hashes: list[str]) -> list[str]:
+    """Classify documents the keywords could not settle: exact cache, then semantic cache, then the LLM"""
+    # An exact hit on disk needs no network at all, check it before embedding
+    keys = [_cache_key("classify", content_hash) for content_hash in content_hashes]
+    labels = [cache.get(key) for key in keys]
+    misses = [i for i, label in enumerate(labels) if label is None]
+    if not misses:
+        return labels
+
+    # Near-duplicates of an already classified document reuse its label
+    embeddings = await _embed_or_none([documents[i] for i in misses])
+    embeddings = dict(zip(misses, embeddings)) if embeddings is not None else {}
+    for i, embedding in embeddings.items():
+        labels[i] = semantic_cache.lookup(embedding)
+
+    misses = [i for i in misses if labels[i] is None]
+    if len(misses) == 1:
+        llm_labels = [await _classify_with_llm(documents[misses[0]])]
+    elif misses:
+        try:
+            llm_labels = await classify_batch([documents[i] for i in misses])
+        except ValueError:
+            # One bad response only costs these documents a call each, not the whole run
+            logger.warning("Batch classification failed, classifying %d documents one by one", len(misses))
+            llm_labels = await asyncio.gather(*[_classify_with_llm(documents[i]) for i in misses])
+    else:
+        llm_labels = []
+
+    for i, label in zip(misses, llm_labels):
+        labels[i] = label
+        # Free text would be served again on reruns and spread to every near-duplicate, only remember real categories
+        if label in _CATEGORIES:
+            cache.set(keys[i], label)
+            if i in embeddings:
+                semantic_cache.add(embeddings[i], label)
+    return labels
+
+async def classify(state: DocumentState) -> DocumentState:
+    """Classify the document by keywords, falling back to the caches and the LLM when ambiguous"""
+    if state["classification"]:
+        # Already classified upstream (e.g. by classify_batch)
+        return {}
+
+    classification = classify_by_keywords(state['document'])
+    if classification is not None:
+        logger.debug("[classify_keywords] -> %s", classification)
+        return {"classification": classification}
+
+    [classification] = await _classify_ambiguous([state['document']], [state["content_hash"]])
+    logger.debug("[classify] -> %s", classification)
 
-def extract_appraisal_data(state: DocumentState) -> DocumentState:
-    """Extract appraisal data from appraisal documents"""
-    schema = AppraisalData.model_json_schema()
+    return {"classification": classification}
 
-    prompt = f"""Extract appraisal information from this document as JSON.
+async def classify_batch(docs: list[str]) -> list[str]:
+    """Classify several documents with a single LLM call"""
+    prompt = _CLASSIFY_BATCH_PROMPT + "".join(f"\n[DOC {i}]\n{doc}\n" for i, doc in enumerate(docs, 1))
 
-Document: 
-{state['document']}
+    response = await _llm_completion([{"role": "user", "content": prompt}])
+    content = response["choices"][0]["message"]["content"] or ""
 
-Schema:
-{json.dumps(schema, indent=2)}
+    try:
+        labels = orjson.loads(content)
+    except orjson.JSONDecodeError:
+        labels = None
+    if not (isinstance(labels, list) and len(labels) == len(docs) and all(isinstance(label, str) for label in labels)):
+        raise ValueError(f"Expected a JSON array of {len(docs)} category strings, got: {content[:200]}")
+    return [label.strip().lower() for label in labels]
 
-Return ONLY valid JSON.
-"""
+async def extract_loan_data(state: DocumentState) -> DocumentState:
+    """Extract loan data from loan disclosure documents"""
+    prompt = _LOAN_PREFIX + state['document'] + _LOAN_SUFFIX
 
-    response = completion(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0
-    )
+    key = _cache_key("extract_loan", state["content_hash"])
+    try:
+        data = await _extract(prompt, key, LoanData, _LOAN_RESPONSE_FORMAT)
+    except ExtractionRefused as e:
+        logger.debug("[extract_loan_data] -> refused: %s", e)
+        return {"error": f"Model refused to extract loan data: {e}", "confidence": 0.0}
+    extracted = msgspec.to_builtins(data)
+    logger.debug("[extract_loan_data] -> %s", extracted)
 
-    json_str = response["choices"][0].message.content
-    json_str = json_str.replace("```json", "").replace("```", "").strip()
+    return {"extracted_data": extracted, "confidence": 0.95}
 
-    data = AppraisalData.model_validate_json(json_str)
-    print(f"   [extract_appraisal_data] -> {data.model_dump()}")
+async def extract_appraisal_data(state: DocumentState) -> DocumentState:
+    """Extract appraisal data from appraisal documents"""
+    prompt = _APPRAISAL_PREFIX + state['document'] + _APPRAISAL_SUFFIX
 
-    return {"extracted_data": data.model_dump(), "confidence": 0.92}
+    key = _cache_key("extract_appraisal", state["content_hash"])
+    try:
+        data = await _extract(prompt, key, AppraisalData, _APPRAISAL_RESPONSE_FORMAT)
+    except ExtractionRefused as e:
+        logger.debug("[extract_appraisal_data] -> refused: %s", e)
+        return {"error": f"Model refused to extract appraisal data: {e}", "confidence": 0.0}
+    extracted = msgspec.to_builtins(data)
+    logger.debug("[extract_appraisal_data] -> %s", extracted)
+
+    return {"extracted_data": extracted, "confidence": 0.92}
 
 def handle_unknown(state: DocumentState) -> DocumentState:
     """Handle unknown document type"""
-    print(f"   [handle_unknown] -> Needs human review")
+    logger.debug("[handle_unknown] -> Needs human review")
     return {"error": "Unrecognized document type. Please review manually.", "confidence": 0.0}
 
 def route_by_type(state: DocumentState) -> Literal["classify_llm", "extract_loan_data", "extract_appraisal_data", "handle_unknown"]:
@@ -128,13 +418,15 @@ def route_by_type(state: DocumentState) -> Literal["classify_llm", "extract_loan
 workflow = StateGraph(DocumentState)
 
 # Add Nodes
-workflow.add_node("classify", classify_with_llm)
+workflow.add_node("hash_doc", hash_doc)
+workflow.add_node("classify", classify)
 workflow.add_node("extract_loan", extract_loan_data)
 workflow.add_node("extract_appraisal", extract_appraisal_data)
 workflow.add_node("unknown", handle_unknown)
 
 # Add Edges (conections)
-workflow.add_edge(START, "classify")
+workflow.add_edge(START, "hash_doc")
+workflow.add_edge("hash_doc", "classify")
 workflow.add_conditional_edges(
     "classify",
     route_by_type,
@@ -151,10 +443,168 @@ workflow.add_edge("unknown", END)
 # Compile Workflow
 app = workflow.compile()
 
+
+# Batch workflow - classify every document in one call, then process them in parallel branches
+async def classify_documents(state: BatchState) -> BatchState:
+    """Classify all documents of the batch, sending only the ambiguous ones to the LLM in chunks"""
+    documents = state["documents"]
+    content_hashes = [_content_hash(document) for document in documents]
+    classifications = [classify_by_keywords(document) for document in documents]
+
+    ambiguous = [i for i, classification in enumerate(classifications) if classification is None]
+    chunks = [ambiguous[start:start + CLASSIFY_BATCH_SIZE] for start in range(0, len(ambiguous), CLASSIFY_BATCH_SIZE)]
+    chunk_labels = await asyncio.gather(*[
+        _classify_ambiguous([documents[i] for i in chunk], [content_hashes[i] for i in chunk])
+        for chunk in chunks
+    ])
+    for chunk, labels in zip(chunks, chunk_labels):
+        for i, label in zip(chunk, labels):
+            classifications[i] = label
+
+    logger.debug("[classify_batch] -> %s", classifications)
+    return {"classifications": classifications, "content_hashes": content_hashes}
+
+def dispatch(state: BatchState) -> list[Send]:
+    """Fan out one branch per document, each running the single-document workflow"""
+    return [
+        Send("process", {**_EMPTY_STATE, "document": document, "classification": classification, "content_hash": content_hash})
+        for document, classification, content_hash in zip(state["documents"], state["classifications"], state["content_hashes"])
+    ]
+
+async def process_document(state: DocumentState) -> BatchState:
+    """Run one document through the workflow and collect its final state"""
+    result = await app.ainvoke(state)
+    return {"results": [result]}
+
+batch_workflow = StateGraph(BatchState)
+
+batch_workflow.add_node("classify", classify_documents)
+batch_workflow.add_node("process", process_document)
+
+batch_workflow.add_edge(START, "classify")
+batch_workflow.add_conditional_edges("classify", dispatch, ["process"])
+batch_workflow.add_edge("process", END)
+
+batch_app = batch_workflow.compile()
+
+
+# Bulk extraction - offline path through the OpenAI Batch API
+# Extraction task per classification: cache task name, prompt prefix and suffix, response format, model, confidence
+_BULK_TASKS = {
+    "loan_disclosure": ("extract_loan", _LOAN_PREFIX, _LOAN_SUFFIX, _LOAN_RESPONSE_FORMAT, LoanData, 0.95),
+    "appraisal": ("extract_appraisal", _APPRAISAL_PREFIX, _APPRAISAL_SUFFIX, _APPRAISAL_RESPONSE_FORMAT, AppraisalData, 0.92)
+}
+
+def _bulk_request(custom_id: str, state: DocumentState) -> dict:
+    """Batch API request line for one classified document"""
+    _, prefix, suffix, response_format, _, _ = _BULK_TASKS[state["classification"]]
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": MODEL,
+            "messages": [{"role": "user", "content": prefix + state["document"] + suffix}],
+            "temperature": 0,
+            "response_format": response_format
+        }
+    }
+
+def _apply_extraction(state: DocumentState, json_str: str) -> None:
+    """Decode extracted JSON into the state, raises msgspec.DecodeError or TypeError when it is invalid"""
+    _, _, _, _, model, confidence = _BULK_TASKS[state["classification"]]
+    state["extracted_data"] = msgspec.to_builtins(msgspec.json.decode(json_str, type=model))
+    state["confidence"] = confidence
+
+def _apply_bulk_response(state: DocumentState, row: dict) -> None:
+    """Store the extraction result (or error) of one Batch API output line in the state, caching valid ones"""
+    response = row.get("response")
+    if row.get("error") or response is None or response["status_code"] != 200:
+        state["error"] = f"Batch extraction failed: {row.get('error') or response}"
+        return
+
+    message = response["body"]["choices"][0]["message"]
+    json_str = message.get("content")
+    if json_str is None:
+        state["error"] = f"Model refused to extract: {message.get('refusal') or 'no content returned'}"
+        return
+
+    # A bad line only fails its own document, the rest of the paid batch is kept
+    try:
+        _apply_extraction(state, json_str)
+    except (msgspec.DecodeError, TypeError) as e:
+        state["error"] = f"Batch extraction returned invalid data: {e}"
+        return
+    cache.set(_cache_key(_BULK_TASKS[state["classification"]][0], state["content_hash"]), json_str)
+
+async def bulk_extract(docs: list[str]) -> list[DocumentState]:
+    """Extract many documents through the OpenAI Batch API, or interactively for small sets"""
+    if len(docs) < BULK_THRESHOLD:
+        result = await batch_app.ainvoke({"documents": docs, "classifications": [], "content_hashes": [], "results": []})
+        return result["results"]
+
+    classified = await classify_documents({"documents": docs, "classifications": [], "content_hashes": [], "results": []})
+    states = [
+        {**_EMPTY_STATE, "document": document, "classification": classification, "content_hash": content_hash}
+        for document, classification, content_hash in zip(docs, classified["classifications"], classified["content_hashes"])
+    ]
+
+    requests = []
+    for i, state in enumerate(states):
+        if state["classification"] not in _BULK_TASKS:
+            state.update(handle_unknown(state))
+            continue
+
+        # Documents already extracted (interactively or by an earlier batch) are not paid for again
+        key = _cache_key(_BULK_TASKS[state["classification"]][0], state["content_hash"])
+        json_str = cache.get(key)
+        if json_str is not None:
+            try:
+                _apply_extraction(state, json_str)
+                continue
+            except msgspec.DecodeError:
+                # Stale entry, evict and refetch
+                cache.delete(key)
+        requests.append(_bulk_request(str(i), state))
+    if not requests:
+        return states
+
+    client = _get_client()
+    batch_file = await client.files.create(
+        file=("requests.jsonl", b"\n".join(orjson.dumps(r) for r in requests)),
+        purpose="batch"
+    )
+    batch = await client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    logger.debug("[bulk_extract] -> submitted %s requests as batch %s", len(requests), batch.id)
+
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        await asyncio.sleep(_BATCH_POLL_SECONDS)
+        batch = await client.batches.retrieve(batch.id)
+    if batch.status != "completed":
+        raise RuntimeError(f"Batch {batch.id} ended with status {batch.status}")
+
+    # Successful lines land in the output file, failed ones in the error file
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if file_id is None:
+            continue
+        content = await client.files.content(file_id)
+        for line in content.text.splitlines():
+            row = orjson.loads(line)
+            _apply_bulk_response(states[int(row["custom_id"])], row)
+
+    return states
+
+
+async def run_all(docs: list[str]) -> list[DocumentState]:
+    """Run the workflow over several documents concurrently"""
+    return await asyncio.gather(*[app.ainvoke({**_EMPTY_STATE, "document": d}) for d in docs])
+
+
 # Tests
-print("=" * 50)
-print("TEST 1: Loan Document")
-print("=" * 50)
 loan_doc = """
 LOAN DISCLOSURE STATEMENT
 Borrower: Maria Pons
@@ -163,18 +613,7 @@ Annual Interest Rate: 5.875%
 Term: 30 years
 Lender: First National Bank
 """
-result1 = app.invoke({
-    "document": loan_doc,
-    "classification": "",
-    "extracted_data": {},
-    "confidence": 0.0,
-    "error": ""
-})
-print(f"\nFinal: {result1}\n")
-
-print("=" * 50)
-print("TEST 2: Appraisal Document")
-print("=" * 50)
+
 appraisal_doc = """
 PROPERTY APPRAISAL REPORT
 Property Address: 123 Main St, New York, NY 10001
@@ -182,29 +621,40 @@ Appraised Value: $500,000
 Appraisal Date: Decemeber 20, 2025
 Appraiser: George Navarro
 """
-result2 = app.invoke({
-    "document":appraisal_doc,
-    "classification": "",
-    "extracted_data": {},
-    "confidence": 0.0,
-    "error": ""
-})
-print(f"\nFinal: {result2}\n")
-
-print("=" * 50)
-print("TEST 3: Unknown Document")
-print("=" * 50)
+
 unknown_doc = """
 RESTAURANT MENU
 Pizza: $12.99
 Burger: $10.99
 Drinks: $5.99
 """
-result3 = app.invoke({
-    "document": unknown_doc,
-    "classification": "",
-    "extracted_data": {},
-    "confidence": 0.0,
-    "error": ""
-})
-print(f"\nFinal: {result3}\n")
\ No newline at end of file
+
+async def main(documents: list[str]) -> BatchState:
+    """Process documents through batch_app, closing the HTTP pool before the loop ends"""
+    try:
+        return await batch_app.ainvoke({"documents": documents, "classifications": [], "content_hashes": [], "results": []})
+    finally:
+        await aclose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+
+    # All three documents are classified with one LLM call, then extracted in parallel
+    batch_result = asyncio.run(main([loan_doc, appraisal_doc, unknown_doc]))
+    result1, result2, result3 = batch_result["results"]
+
+    print("=" * 50)
+    print("TEST 1: Loan Document")
+    print("=" * 50)
+    print(f"\nFinal: {result1}\n")
+
+    print("=" * 50)
+    print("TEST 2: Appraisal Document")
+    print("=" * 50)
+    print(f"\nFinal: {result2}\n")
+
+    print("=" * 50)
+    print("TEST 3: Unknown Document")
+    print("=" * 50)
+    print(f"\nFinal: {result3}\n")
@@ -1,5 +1,12 @@
 from typing import TypedDict
 from langgraph.graph import StateGraph, START, END
+from dotenv import load_dotenv
+import logging
+import os
+
+import classifier
+
+logger = logging.getLogger(__name__)
 
 
 # 1. Define the State - What data travels through the graph
@@ -13,16 +20,9 @@ class WorkflowState(TypedDict):
 # 2. Define Nodes - functions that transform the state
 def classify_document(state: WorkflowState) -> WorkflowState:
     """Classify the document type"""
-    doc = state['document'].lower()
+    classification = classifier.classify_document(state['document'])
 
-    if "loan" in doc:
-        classification = "loan_disclosure"
-    elif "appraisal" in doc:
-        classification = "appraisal"
-    else:
-        classification = "unknown"
-
-    print(f"   [classify] -> {classification}")
+    logger.debug("[classify] -> %s", classification)
     # return {**state, 'classification': classification}
     return {"classification": classification}
 
@@ -34,7 +34,7 @@ def extract_data(state: WorkflowState) -> WorkflowState:
         "has_content": len(state['document']) > 0
     }
 
-    print(f"   [extract] -> {extracted}")
+    logger.debug("[extract] -> %s", extracted)
     return {"extracted_data": extracted}
 
 def validate_data(state: WorkflowState) -> WorkflowState:
@@ -44,7 +44,7 @@ def validate_data(state: WorkflowState) -> WorkflowState:
         and state["extracted_data"].get("has_content", False)
     )
 
-    print(f"   [validate] -> valid={is_valid}")
+    logger.debug("[validate] -> valid=%s", is_valid)
     return {"is_valid": is_valid}
 
 # 3. Build the graph
@@ -65,15 +65,16 @@ workflow.add_edge("validate", END)
 app = workflow.compile()
 
 # 4. Execute
-print("=== Running workflow ===\n")
-initial_state = {
-    "document": "This is a LOAN disclosure document for $500,000",
-    "classification": "",
-    "extracted_data": {},
-    "is_valid": False
-}
-
-result = app.invoke(initial_state)
-
-print("\n=== Final State ====")
-print(result)
+_EMPTY_STATE = {"classification": "", "extracted_data": {}, "is_valid": False}
+
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+
+    print("=== Running workflow ===\n")
+    initial_state = {**_EMPTY_STATE, "document": "This is a LOAN disclosure document for $500,000"}
+
+    result = app.invoke(initial_state)
+
+    print("\n=== Final State ====")
+    print(result)
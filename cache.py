@@ -0,0 +1,27 @@
+from pathlib import Path
+from typing import Optional
+import orjson
+
+
+# Responses are stored as plain JSON files, one per key, so they are easy to inspect
+CACHE_DIR = Path(".llm_cache")
+
+
+def _path(key: str) -> Path:
+    return CACHE_DIR / f"{key}.json"
+
+def get(key: str) -> Optional[str]:
+    """Return the cached response for this key, or None on a miss"""
+    path = _path(key)
+    if not path.exists():
+        return None
+    return orjson.loads(path.read_bytes())["content"]
+
+def set(key: str, value: str) -> None:
+    """Store a response under this key"""
+    CACHE_DIR.mkdir(exist_ok=True)
+    _path(key).write_bytes(orjson.dumps({"key": key, "content": value}, option=orjson.OPT_INDENT_2))
+
+def delete(key: str) -> None:
+    """Evict a stale entry"""
+    _path(key).unlink(missing_ok=True)
@@ -0,0 +1,16 @@
+import re
+
+
+# Shared by the example graphs, so the pattern is compiled once per process
+_CLASSIFIER = re.compile(r"(loan)|(appraisal)", re.IGNORECASE)
+
+
+def classify_document(doc_text: str) -> str:
+    """Classify a document by keywords in a single case-insensitive pass"""
+    # "loan" anywhere still wins over "appraisal"
+    classification = "unknown"
+    for match in _CLASSIFIER.finditer(doc_text):
+        if match.group(1):
+            return "loan_disclosure"
+        classification = "appraisal"
+    return classification
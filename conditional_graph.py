@@ -1,5 +1,12 @@
 from typing import TypedDict, Literal
 from langgraph.graph import StateGraph, START, END
+from dotenv import load_dotenv
+import logging
+import os
+
+import classifier
+
+logger = logging.getLogger(__name__)
 
 
 class WorkflowState(TypedDict):
@@ -11,21 +18,14 @@ class WorkflowState(TypedDict):
 
 def classify_document(state: WorkflowState) -> WorkflowState:
     """Classify the document type"""
-    doc = state['document'].lower()
+    classification = classifier.classify_document(state['document'])
 
-    if "loan" in doc:
-        classification = "loan_disclosure"
-    elif "appraisal" in doc:
-        classification = "appraisal"
-    else:
-        classification = "unknown"
-
-    print(f"   [classify] -> {classification}")
+    logger.debug("[classify] -> %s", classification)
     return {"classification": classification}
 
 def extract_data(state: WorkflowState) -> WorkflowState:
     """Extract data from the document"""
-    print(f"   [extract] -> Processing {state['classification']}")
+    logger.debug("[extract] -> Processing %s", state['classification'])
     return {
         "extracted_data": {
             "type": state['classification'],
@@ -35,7 +35,7 @@ def extract_data(state: WorkflowState) -> WorkflowState:
 
 def handle_unknown(state: WorkflowState) -> WorkflowState:
     """Handle unknown classification"""
-    print(f"   [handle_unknown] -> Needs human review")
+    logger.debug("[handle_unknown] -> Needs human review")
     return {
         "error_message": "Document type not recognized. Please review mannually."
     }
@@ -75,22 +75,24 @@ workflow.add_edge("handle_unknown", END)
 # Compile
 app = workflow.compile()
 
-# Test with valid document
-print("=== Test 1: Valid document ===")
-result1 = app.invoke({
-    "document": "LOAN disclosure for $500,000",
-    "classification": "",
-    "extracted_data": {},
-    "error_message": ""
-})
-print(f"Result: {result1}\n")
-
-# Test with unknown document
-print("\n=== Test 2: Unknown document ===")
-result2 = app.invoke({
-    "document": "Random document about something else",
-    "classification": "",
-    "extrated_data": {},
-    "error_message": ""
-})
-print(f"Result: {result2}\n")
\ No newline at end of file
+# Default values for every field except the document itself
+_EMPTY_STATE = {"classification": "", "extracted_data": {}, "error_message": ""}
+
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+
+    inputs = [
+        {**_EMPTY_STATE, "document": "LOAN disclosure for $500,000"},
+        {**_EMPTY_STATE, "document": "Random document about something else"}
+    ]
+    # Both tests run in a single batch call
+    result1, result2 = app.batch(inputs)
+
+    # Test with valid document
+    print("=== Test 1: Valid document ===")
+    print(f"Result: {result1}\n")
+
+    # Test with unknown document
+    print("\n=== Test 2: Unknown document ===")
+    print(f"Result: {result2}\n")
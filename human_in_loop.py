@@ -1,6 +1,12 @@
 from typing import TypedDict, Literal
 from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+from dotenv import load_dotenv
+import logging
+import os
+import sqlite3
+
+logger = logging.getLogger(__name__)
 
 
 class ApprovalState(TypedDict):
@@ -16,7 +22,7 @@ def extract_amount(state: ApprovalState) -> ApprovalState:
     amount = 500000.00
     requires_approval = amount > 100000.0   # Huge amounts require approval
 
-    print(f"   [extract_amount] -> amount=${amount:,.0f}, requires approval={requires_approval}")
+    logger.debug("[extract_amount] -> amount=$%s, requires approval=%s", f"{amount:,.0f}", requires_approval)
     return {
         "extracted_amount": amount,
         "requires_approval": requires_approval
@@ -30,22 +36,22 @@ def check_approval_needed(state: ApprovalState) -> Literal["wait_approval", "aut
 
 def wait_for_approval(state: ApprovalState) -> ApprovalState:
     """Node that whait for human approval"""
-    print(f"   [wait_approval] -> Waiting for human approval...")
+    logger.debug("[wait_approval] -> Waiting for human approval...")
     # The current State is saved, the workflow is paused here
     return {"status": "waiting"}
 
 def auto_approve(state: ApprovalState) -> ApprovalState:
     """Automatically approve small amounts"""
-    print(f"   [auto_approve] + Auto-approved (amount under threshold)")
+    logger.debug("[auto_approve] + Auto-approved (amount under threshold)")
     return {"approved": True, "status": "auto_approved"}
 
 def finalize(state: ApprovalState) -> ApprovalState:
     """Finalize the process"""
     if state["approved"]:
-        print(f"   [finalize] + Processing Complete!")
+        logger.debug("[finalize] + Processing Complete!")
         return {"status": "complete"}
     else:
-        print(f"   [finalize] - Rejected")
+        logger.debug("[finalize] - Rejected")
         return {"status": "rejected"}
 
 # Build the graph
@@ -71,40 +77,47 @@ workflow.add_edge("wait_approval", "finalize")
 workflow.add_edge("auto_approve", "finalize")
 workflow.add_edge("finalize", END)
 
-# Checkpointer - store the current state in memory for summary
-memory = MemorySaver()
+# Checkpointer - store the current state on disk so it survives restarts and can be shared
+# WAL mode lets readers in other processes work while a checkpoint is being written
+conn = sqlite3.connect("checkpoints.db", check_same_thread=False)
+conn.execute("PRAGMA journal_mode=WAL")
+memory = SqliteSaver(conn)
 app = workflow.compile(checkpointer=memory, interrupt_before=["finalize"])
 
-# Simulate execution with interrupts
-print("=" * 50)
-print("HUMAN-IN-THE-LOOP EXECUTION")
-print("=" * 50)
-
-# Thread ID to track this conversation
-config = {"configurable": {"thread_id": "loan-123"}}
-
-# Step 1 - Start Workflow
-print("\n--- Step 1: Start Workflow ---")
-initial_state = {
-    "document": "Loan for $500,000",
-    "extracted_amount": 0.0,
-    "requires_approval": False,
-    "approved": False,
-    "status": ""
-}
-result = app.invoke(initial_state, config=config)
-print(f"State after extraction: {result}")
-print(f"Status: {result['status']}")
-
-# The workflow is paused here before the "finalize"
-# In a real app, we would show the user a UI here for approval.
-
-# Step 2: Simulate human approval
-print("\n--- Step 2: Human approves ---")
-# we update here the status with the human decision
-app.update_state(config, {"approved": True})
-
-# Step 3: Summarize the workflow
-print("\n--- Step 3: Resume workflow ---")
-final_result = app.invoke(None, config=config)
-print(f"Final state: {final_result}")
\ No newline at end of file
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+
+    # Simulate execution with interrupts
+    print("=" * 50)
+    print("HUMAN-IN-THE-LOOP EXECUTION")
+    print("=" * 50)
+
+    # Thread ID to track this conversation
+    config = {"configurable": {"thread_id": "loan-123"}}
+
+    # Step 1 - Start Workflow
+    print("\n--- Step 1: Start Workflow ---")
+    initial_state = {
+        "document": "Loan for $500,000",
+        "extracted_amount": 0.0,
+        "requires_approval": False,
+        "approved": False,
+        "status": ""
+    }
+    result = app.invoke(initial_state, config=config)
+    print(f"State after extraction: {result}")
+    print(f"Status: {result['status']}")
+
+    # The workflow is paused here before the "finalize"
+    # In a real app, we would show the user a UI here for approval.
+
+    # Step 2: Simulate human approval
+    print("\n--- Step 2: Human approves ---")
+    # we update here the status with the human decision
+    app.update_state(config, {"approved": True})
+
+    # Step 3: Summarize the workflow
+    print("\n--- Step 3: Resume workflow ---")
+    final_result = app.invoke(None, config=config)
+    print(f"Final state: {final_result}")
@@ -0,0 +1,53 @@
+from typing import Optional
+import numpy as np
+
+
+# Cosine similarity needed to reuse the label of a cached document
+SIMILARITY_THRESHOLD = 0.92
+# Once full, new documents overwrite the oldest entries
+MAX_ENTRIES = 10_000
+_INITIAL_CAPACITY = 64
+
+# Unit-length embeddings, one row per cached document (only the first _size rows are used), and their labels
+_embeddings: Optional[np.ndarray] = None
+_labels: list[str] = []
+_size = 0
+_oldest = 0
+
+
+def _normalize(embedding: list[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+def lookup(embedding: list[float]) -> Optional[str]:
+    """Return the label of the most similar cached document, or None if nothing is close enough"""
+    if not _size:
+        return None
+
+    similarities = _embeddings[:_size] @ _normalize(embedding)
+    best = int(np.argmax(similarities))
+    if similarities[best] >= SIMILARITY_THRESHOLD:
+        return _labels[best]
+    return None
+
+def add(embedding: list[float], label: str) -> None:
+    """Remember the label of an embedded document"""
+    global _embeddings, _size, _oldest
+    vector = _normalize(embedding)
+
+    if _embeddings is None:
+        _embeddings = np.empty((_INITIAL_CAPACITY, vector.shape[0]), dtype=np.float32)
+    elif _size == len(_embeddings) and _size < MAX_ENTRIES:
+        # Grow by doubling, so inserts copy the matrix only O(log n) times
+        grown = np.empty((min(2 * _size, MAX_ENTRIES), vector.shape[0]), dtype=np.float32)
+        grown[:_size] = _embeddings
+        _embeddings = grown
+
+    if _size < len(_embeddings):
+        _embeddings[_size] = vector
+        _labels.append(label)
+        _size += 1
+    else:
+        _embeddings[_oldest] = vector
+        _labels[_oldest] = label
+        _oldest = (_oldest + 1) % MAX_ENTRIES